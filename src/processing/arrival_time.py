@@ -1,7 +1,10 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from obspy import read
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from .mseed_loader import read_header
 from tqdm import tqdm
 
 
@@ -22,36 +25,32 @@ class ArrivalTime:
         # Leer CSV con tiempos de llegada de prueba
         test_df = pd.read_csv(self.test_csv_path)
         
-        # Preparar DataFrame para almacenar tiempos de llegada
-        test_times_df = pd.DataFrame(columns=['file', 'arrival_time'])
-        
         print('Procesando tiempos de llegada del conjunto de prueba...')
-        for _, row in tqdm(test_df.iterrows(), total=len(test_df)):
-            file_id = row['archivo']
-            mseed_file = f"{file_id:08d}.mseed"
-            file_path = os.path.join(data_path, mseed_file)
-            
-            try:
-                # Leer señal y obtener tiempo relativo
-                st = read(file_path)
-                absolute_p_time = row['lec_p']
-                relative_p_time = absolute_p_time - st[0].stats.starttime.timestamp
-                
-                # Agregar al DataFrame
-                test_times_df = pd.concat([test_times_df, pd.DataFrame([{
-                    'file': mseed_file,
-                    'arrival_time': relative_p_time
-                }])], ignore_index=True)
-                
-            except Exception as e:
+        mseed_files = [f"{file_id:08d}.mseed" for file_id in test_df['archivo'].to_numpy()]
+        
+        file_paths = [os.path.join(data_path, mseed_file) for mseed_file in mseed_files]
+        
+        # Solo se usa el tiempo de inicio: se leen solo las cabeceras, en paralelo
+        with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+            headers = list(tqdm(executor.map(read_header, file_paths), total=len(file_paths)))
+        
+        files = []
+        arrival_times = []
+        for mseed_file, absolute_p_time, (header, error) in zip(mseed_files, test_df['lec_p'].to_numpy(), headers):
+            if error is not None:
                 continue
+            start_time = header[0]
+            files.append(mseed_file)
+            arrival_times.append(absolute_p_time - start_time)
+        arrival_times = np.asarray(arrival_times, dtype=np.float64)
         
-        # Guardar tiempos de llegada
-        test_times_df.to_csv(os.path.join(self.features_path, f'{data_name}.csv'), index=False)
-        np.save(os.path.join(self.features_path, data_name), test_times_df['arrival_time'].values)
+        # Guardar tiempos de llegada directamente desde los arreglos (escritor CSV de PyArrow)
+        pa_csv.write_csv(pa.table({'file': files, 'arrival_time': arrival_times}),
+                         os.path.join(self.features_path, f'{data_name}.csv'))
+        np.save(os.path.join(self.features_path, data_name), arrival_times)
         
         print(f'Tiempos de llegada guardados en {data_path}/{data_name}.csv')
         print(f'y {self.features_path}/test_arrival_times.npy')
         
-        return test_times_df
+        return pd.DataFrame({'file': files, 'arrival_time': arrival_times})
 
@@ -1,8 +1,13 @@
 import pandas as pd
+try:
+    from .mseed_loader import read_header
+except ImportError:
+    # Ejecutado directamente como script (python src/processing/lenght_waves.py)
+    from mseed_loader import read_header
 from tqdm import tqdm
-from obspy import read
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
 
 val_data_path = "/mnt/c/Users/Usuario/Documents/Studies/GicoProject/SeismicWaves/data/procesed/used_data/training_augmented/val"
@@ -20,28 +25,34 @@ def analyze_signal_lengths(data_path):
     Returns:
         dict: Estadísticas de longitud de señales
     """
-    lengths = []
     files_df = pd.read_csv(os.path.join(data_path, "feature_files.csv"))
 
+    files = files_df["file"].tolist()
+    file_paths = [os.path.join(data_path, file) for file in files]
+
+    # Solo se leen las cabeceras: la longitud está en stats.npts
     print(f"Analizando señales en {data_path}...")
-    for file in tqdm(files_df["file"]):
-        file_path = os.path.join(data_path, file)
-        try:
-            st = read(file_path)
-            signal_length = len(st[0].data)
-            lengths.append(signal_length)
-        except Exception as e:
-            print(f"Error procesando {file}: {str(e)}")
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+        headers = list(tqdm(executor.map(read_header, file_paths), total=len(file_paths)))
+
+    lengths = []
+    for file, (header, error) in zip(files, headers):
+        if error is not None:
+            print(f"Error procesando {file}: {error}")
             continue
+        lengths.append(header[2])
+    lengths = np.asarray(lengths, dtype=np.int32)
 
+    # Mediana y p95 con una sola llamada
+    median_length, p95_length = np.percentile(lengths, [50, 95])
     stats = {
-        "min_length": min(lengths),
-        "max_length": max(lengths),
-        "mean_length": np.mean(lengths),
-        "median_length": np.median(lengths),
-        "std_length": np.std(lengths),
-        "p95_length": np.percentile(lengths, 95),
-        "num_signals": len(lengths),
+        "min_length": lengths.min(),
+        "max_length": lengths.max(),
+        "mean_length": lengths.mean(),
+        "median_length": median_length,
+        "std_length": lengths.std(),
+        "p95_length": p95_length,
+        "num_signals": lengths.size,
     }
 
     return stats, lengths
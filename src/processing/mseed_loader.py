@@ -0,0 +1,58 @@
+import queue
+import threading
+from obspy import read
+
+
+def read_trace(file_path):
+    """Read the first trace of an MSEED file.
+    Args:
+        file_path: Path to the MSEED file
+    Returns:
+        tuple: (samples, start timestamp, sampling rate, number of samples)"""
+    trace = read(file_path)[0]
+    stats = trace.stats
+    return trace.data, stats.starttime.timestamp, stats.sampling_rate, stats.npts
+
+
+def prefetch(func, items, depth=4):
+    """Yield func(item) for each item in order, computing up to depth results ahead
+    on a background thread so that reading the next files overlaps with processing
+    the current one.
+    Args:
+        func: Function applied to each item, typically a file reader
+        items: Iterable of arguments for func
+        depth: Maximum number of results computed ahead of the consumer
+    Returns:
+        generator: Results of func; an exception raised by func is re-raised here"""
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for item in items:
+                buffer.put((func(item), None))
+        except Exception as e:
+            buffer.put((None, e))
+        else:
+            buffer.put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        result, error = buffer.get()
+        if error is not None:
+            raise error
+        if result is done:
+            return
+        yield result
+
+
+def read_header(file_path):
+    """Read only the header of an MSEED file.
+    Returns:
+        tuple: ((start timestamp, sampling rate, number of samples) or None, error message or None)"""
+    try:
+        stats = read(file_path, headonly=True)[0].stats
+        return (stats.starttime.timestamp, stats.sampling_rate, stats.npts), None
+    except Exception as e:
+        return None, str(e)
+
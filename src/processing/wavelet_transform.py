@@ -1,82 +1,257 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import pandas as pd
 import numpy as np
-from obspy import read
+from .mseed_loader import prefetch, read_header, read_trace
 from tqdm import tqdm
-import scipy.stats as stats
 import matplotlib.pyplot as plt
 import pywt
+from numba import njit
+
+# Statistics extracted from each wavelet coefficient level, in this order:
+# mean, std, skewness, kurtosis, 75th percentile, 25th percentile,
+# max, min, L1 norm, L2 norm, entropy, median of |coef|
+N_STATS = 12
+
+# Maximum number of equal-length signals decomposed together in one call
+BATCH_SIZE = 64
+
+
+@njit(fastmath=True, cache=True)
+def _band_stats(coef, out):
+    """Write mean, std, skewness, kurtosis, max, min, L1 and L2 norm and entropy
+    of one coefficient band into their slots of out (see N_STATS), in a single pass."""
+    n = coef.size
+    # Power sums are taken around the first sample rather than zero, which
+    # keeps them close to the central moments and avoids cancellation
+    shift = float(coef[0])
+    s1 = 0.0
+    s2 = 0.0
+    s3 = 0.0
+    s4 = 0.0
+    abs_total = 0.0
+    abs_log_total = 0.0
+    sq_total = 0.0
+    lo = shift
+    hi = shift
+    for value in coef:
+        # Accumulate in float64 even for float32 bands
+        x = float(value)
+        d = x - shift
+        d2 = d * d
+        s1 += d
+        s2 += d2
+        s3 += d2 * d
+        s4 += d2 * d2
+        a = abs(x)
+        abs_total += a
+        if a > 0:
+            abs_log_total += a * np.log(a)
+        sq_total += x * x
+        lo = min(lo, x)
+        hi = max(hi, x)
+    
+    # Central moments from the shifted raw moments
+    mu = s1 / n
+    e2 = s2 / n
+    e3 = s3 / n
+    e4 = s4 / n
+    m2 = max(e2 - mu * mu, 0.0)
+    m3 = e3 - 3 * mu * e2 + 2 * mu**3
+    m4 = e4 - 4 * mu * e3 + 6 * mu * mu * e2 - 3 * mu**4
+    
+    out[0] = shift + mu
+    out[1] = np.sqrt(m2)
+    if m2 > 0:
+        out[2] = m3 / m2**1.5
+        out[3] = m4 / (m2 * m2) - 3
+    else:
+        out[2] = np.nan
+        out[3] = np.nan
+    out[6] = hi
+    out[7] = lo
+    out[8] = abs_total
+    out[9] = np.sqrt(sq_total)
+    # Entropy of |coef| / L1: -sum(p log p) = log(L1) - sum(|x| log|x|) / L1
+    if abs_total > 0:
+        out[10] = np.log(abs_total) - abs_log_total / abs_total
+    else:
+        out[10] = np.nan
+
+
+@njit(fastmath=True, cache=True)
+def _batch_band_stats(coefs, out):
+    """Apply _band_stats to each row of a (signals, coefficients) band."""
+    for row in range(coefs.shape[0]):
+        _band_stats(coefs[row], out[row])
+
+
+def _quantiles(x, q):
+    """Linearly interpolated quantiles along the last axis, as np.percentile computes
+    them by default, selected with an O(n) partition instead of a full sort.
+    Args:
+        x: Array, reordered in place along its last axis
+        q: Quantiles in [0, 1]
+    Returns:
+        array: Shape x.shape[:-1] + (len(q),)"""
+    n = x.shape[-1]
+    pos = np.asarray(q) * (n - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    x.partition(np.union1d(lo, hi), axis=-1)
+    return x[..., lo] + (x[..., hi] - x[..., lo]) * (pos - lo)
+
 
 class Wavelets():
     def __init__(self):
         self.augmented_data_path = '/mnt/c/Users/Usuario/Documents/Studies/GicoProject/SeismicWaves/data/procesed/used_data/training_augmented'
         self.features_path = '/mnt/c/Users/Usuario/Documents/Studies/GicoProject/SeismicWaves/data/procesed/features'
+        # Filter bank of the default wavelet, built once instead of on every decomposition
+        self._wavelet = pywt.Wavelet('db4')
         
-    def extract_wavelet_features(self, signal, wavelet='db4', level=4):
+    def extract_wavelet_features(self, signal, wavelet='db4', level=4, out=None):
         """Extract statistical features from wavelet decomposition of a signal.
         Args:
-            signal: Input signal array
+            signal: Input signal array, or 2-D array with one equal-length signal
+                per row to decompose the whole batch in one call
             wavelet: Wavelet type to use
             level: Decomposition level
+            out: Optional preallocated array of length N_STATS * (level + 1)
+                (one row per signal for a batch) to fill
         Returns:
-            array: Feature vector containing statistical measures"""
+            array: Feature vector containing statistical measures (one row per signal for a batch)"""
+        if wavelet == self._wavelet.name:
+            wavelet = self._wavelet
+        
+        signal = np.asarray(signal)
+        signals = signal if signal.ndim == 2 else signal[np.newaxis]
+        
         # Perform wavelet decomposition
-        coeffs = pywt.wavedec(signal, wavelet, level=level)
+        coeffs = pywt.wavedec(signals, wavelet, level=level, axis=-1)
         
-        # Initialize feature list
-        features = []
+        if out is None:
+            out = np.empty(signal.shape[:-1] + (N_STATS * len(coeffs),), dtype=np.float32)
+        features = out if out.ndim == 2 else out[np.newaxis]
         
         # Extract features from each coefficient level
-        for coef in coeffs:
-            # Statistical features
-            features.extend([
-                np.mean(coef),           # Mean
-                np.std(coef),            # Standard deviation
-                stats.skew(coef),        # Skewness
-                stats.kurtosis(coef),    # Kurtosis
-                np.percentile(coef, 75), # 75th percentile
-                np.percentile(coef, 25), # 25th percentile
-                np.max(coef),            # Maximum
-                np.min(coef),            # Minimum
-                np.sum(np.abs(coef)),    # L1 norm
-                np.sqrt(np.sum(coef**2)),# L2 norm
-                stats.entropy(np.abs(coef)), # Signal entropy
-                np.median(np.abs(coef))  # Median absolute deviation
-            ])
+        for i, coef in enumerate(coeffs):
+            bands = features[:, i * N_STATS:(i + 1) * N_STATS]
+            
+            # Moments, extrema, norms and entropy in one compiled pass per signal
+            _batch_band_stats(coef, bands)
             
-        return np.array(features)
+            # Order statistics last: both arrays are reordered in place
+            bands[:, 11] = _quantiles(np.abs(coef), [0.5])[:, 0]
+            bands[:, [4, 5]] = _quantiles(coef, [0.75, 0.25])
+        
+        return out
 
-    def process_seismic_files(self, data_path, arrival_times_csv):
+    def process_seismic_files(self, data_path, arrival_times_csv, wavelet='db4', level=4):
         """Process all seismic files and extract wavelet features.
         Args:
             data_path: Path to directory containing MSEED files
             arrival_times_csv: Path to CSV with arrival times
+            wavelet: Wavelet type to use
+            level: Decomposition level
         Returns:
             tuple: (features array, arrival times array, file names)"""
         # Read arrival times
         arrivals_df = pd.read_csv(arrival_times_csv)
         
-        features_list = []
-        arrival_times = []
-        file_names = []
+        files = arrivals_df['augmented_file'].to_numpy()
+        arrival_times = arrivals_df['arrival_time'].to_numpy()
+        file_paths = [os.path.join(data_path, file) for file in files]
+        
+        # One row per file; rows of files that fail to load are dropped at the end
+        features = np.empty((len(files), N_STATS * (level + 1)), dtype=np.float32)
+        valid = np.zeros(len(files), dtype=bool)
         
         print('Extracting wavelet features...')
-        for _, row in tqdm(arrivals_df.iterrows(), total=len(arrivals_df)):
-            file_path = os.path.join(data_path, row['augmented_file'])
-            
-            try:
-                # Read seismic signal
-                st = read(file_path)
-                signal = st[0].data
-                
-                # Extract features
-                features = self.extract_wavelet_features(signal)
-                features_list.append(features)
-                arrival_times.append(row['arrival_time'])
-                file_names.append(row['augmented_file'])
-                
-            except Exception as e:
-                print(f'Error processing {file_path}: {str(e)}')
-                continue
+        # Decomposition and statistics are CPU-bound and independent per file;
+        # files are sent to the workers in chunks to amortize the IPC round trips
+        max_workers = os.cpu_count() or 1
+        chunksize = max(1, len(file_paths) // (4 * max_workers))
+        # Files are ordered by length (from their headers only) so that each chunk holds
+        # runs of equal-length signals, which the workers decompose in batches
+        with ThreadPoolExecutor(max_workers=max_workers * 2) as executor:
+            headers = list(executor.map(read_header, file_paths))
+        npts = np.array([-1 if error is not None else header[2] for header, error in headers])
+        order = np.argsort(npts, kind='stable')
+        chunks = [order[start:start + chunksize] for start in range(0, len(order), chunksize)]
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+                tqdm(total=len(file_paths)) as progress:
+            results = executor.map(partial(_extract_chunk, wavelet=wavelet, level=level),
+                                   [[file_paths[i] for i in chunk] for chunk in chunks])
+            for chunk, (chunk_features, errors) in zip(chunks, results):
+                features[chunk] = chunk_features
+                for i, error in zip(chunk, errors):
+                    if error is not None:
+                        print(f'Error processing {file_paths[i]}: {error}')
+                        continue
+                    valid[i] = True
+                progress.update(len(chunk))
+        
+        if not valid.all():
+            features, arrival_times, files = features[valid], arrival_times[valid], files[valid]
         
-        return np.array(features_list), np.array(arrival_times), file_names
+        return features, arrival_times, files.tolist()
+
+
+# Wavelets instance reused by _extract_chunk within each worker process
+_worker_wavelets = None
+
+
+def _read_signal(file_path):
+    """Read the samples of one MSEED file as float64.
+    Returns:
+        tuple: (samples or None, error message or None)"""
+    try:
+        # Decomposed in float64: float32 loses the detail of traces with a large DC offset
+        return read_trace(file_path)[0].astype(np.float64, copy=False), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _extract_chunk(file_paths, wavelet='db4', level=4):
+    """Read a chunk of MSEED files and extract their wavelet features.
+    Module-level so it can be sent to worker processes. Consecutive signals of
+    equal length are decomposed together in batches of up to BATCH_SIZE, and the
+    next files are read on a background thread while a batch is being decomposed.
+    Args:
+        file_paths: Paths to the MSEED files
+        wavelet: Wavelet type to use
+        level: Decomposition level
+    Returns:
+        tuple: (features array with one row per file, error message or None per file)"""
+    global _worker_wavelets
+    if _worker_wavelets is None:
+        _worker_wavelets = Wavelets()
+    
+    features = np.empty((len(file_paths), N_STATS * (level + 1)), dtype=np.float32)
+    errors = [None] * len(file_paths)
+    batch_rows = []
+    batch = []
+    
+    def extract_batch():
+        try:
+            features[batch_rows] = _worker_wavelets.extract_wavelet_features(np.stack(batch), wavelet, level)
+        except Exception as e:
+            for i in batch_rows:
+                errors[i] = str(e)
+        batch_rows.clear()
+        batch.clear()
+    
+    for i, (signal, error) in enumerate(prefetch(_read_signal, file_paths)):
+        if error is not None:
+            errors[i] = error
+            continue
+        if batch and (len(signal) != len(batch[0]) or len(batch) == BATCH_SIZE):
+            extract_batch()
+        batch_rows.append(i)
+        batch.append(signal)
+    if batch:
+        extract_batch()
+    
+    return features, errors